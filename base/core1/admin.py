@@ -11,6 +11,7 @@ class BatteryCellAdmin(admin.ModelAdmin):
 
 @admin.register(SimulationResult)
 class SimulationResultAdmin(admin.ModelAdmin):
+    list_select_related = ('battery_cell',)
     list_display = ('battery_cell', 'created_at', 'load_resistance', 'initial_soc', 'temperature')
     list_filter = ('battery_cell__cell_type', 'created_at')
     search_fields = ('battery_cell__cell_type',)
\ No newline at end of file
@@ -7,10 +7,15 @@ import asyncio
 class SimulationConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         await self.accept()
+        # Loop the simulator thread schedules its updates onto
+        self._loop = asyncio.get_running_loop()
+        self._connected = True
         self.simulator = None
         self.sim_task = None
     
     async def disconnect(self, close_code):
+        # The server's loop outlives this socket, so stop scheduling sends ourselves
+        self._connected = False
         if self.simulator:
             self.simulator.stop()
     
@@ -80,17 +85,19 @@ class SimulationConsumer(AsyncWebsocketConsumer):
     
     def send_update(self, data):
         """Callback function for the simulator to send updates"""
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Called from the simulator thread, so hand the send to the consumer's loop
+        if not self._connected:
+            return
         
-        async def send_async():
-            await self.send(text_data=json.dumps({
-                'type': 'simulation_update',
-                'data': data
-            }))
-        
-        loop.run_until_complete(send_async())
-        loop.close()
+        message = self.send(text_data=json.dumps({
+            'type': 'simulation_update',
+            'data': data
+        }))
+        try:
+            asyncio.run_coroutine_threadsafe(message, self._loop)
+        except RuntimeError:
+            # The server is shutting down and its loop closed under us
+            message.close()
     
     async def get_parameters(self, param_id):
         """Get parameters from database"""
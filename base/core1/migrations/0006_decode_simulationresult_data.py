@@ -0,0 +1,40 @@
+import json
+
+from django.db import migrations
+
+
+RESULT_FIELDS = [
+    'emf_data',
+    'terminal_voltage_data',
+    'current_data',
+    'resistance_data',
+    'soc_data',
+    'temperature_data',
+]
+
+
+def decode_result_data(apps, schema_editor):
+    """Results used to be json.dumps()'d before assignment; store them as JSON objects"""
+    SimulationResult = apps.get_model('core1', 'SimulationResult')
+
+    for simulation in SimulationResult.objects.iterator():
+        changed = []
+        for field in RESULT_FIELDS:
+            value = getattr(simulation, field)
+            if isinstance(value, str):
+                setattr(simulation, field, json.loads(value))
+                changed.append(field)
+
+        if changed:
+            simulation.save(update_fields=changed)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core1', '0005_delete_dynamicloadpoint'),
+    ]
+
+    operations = [
+        migrations.RunPython(decode_result_data, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-15 08:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core1', '0006_decode_simulationresult_data'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='simulationresult',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AddConstraint(
+            model_name='batterycell',
+            constraint=models.UniqueConstraint(fields=('cell_type', 'form_factor'), name='uq_cell_type_form_factor'),
+        ),
+    ]
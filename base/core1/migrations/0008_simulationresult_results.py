@@ -0,0 +1,85 @@
+# Generated by Django 5.2.5 on 2026-10-15 08:07
+
+from django.db import migrations, models
+
+
+def fold_results(apps, schema_editor):
+    """Merge the six per-series payloads (each with its own time axis) into results"""
+    SimulationResult = apps.get_model('core1', 'SimulationResult')
+
+    for simulation in SimulationResult.objects.iterator():
+        if simulation.temperature_data is None:
+            continue
+
+        simulation.results = {
+            'time': simulation.emf_data['time'],
+            'emf': simulation.emf_data['emf'],
+            'voltage': simulation.terminal_voltage_data['voltage'],
+            'current': simulation.current_data['current'],
+            'resistance': simulation.resistance_data['resistance'],
+            'soc': simulation.soc_data['soc'],
+            'temperature': simulation.temperature_data['temperature'],
+        }
+        simulation.save(update_fields=['results'])
+
+
+def unfold_results(apps, schema_editor):
+    SimulationResult = apps.get_model('core1', 'SimulationResult')
+
+    for simulation in SimulationResult.objects.iterator():
+        results = simulation.results
+        if results is None:
+            continue
+
+        time = results['time']
+        simulation.emf_data = {'time': time, 'emf': results['emf']}
+        simulation.terminal_voltage_data = {'time': time, 'voltage': results['voltage']}
+        simulation.current_data = {'time': time, 'current': results['current']}
+        simulation.resistance_data = {
+            'time': time,
+            'resistance': results['resistance'],
+            'soc': [soc / 100 for soc in results['soc']],
+        }
+        simulation.soc_data = {'time': time, 'soc': results['soc']}
+        simulation.temperature_data = {'time': time, 'temperature': results['temperature']}
+        simulation.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core1', '0007_alter_simulationresult_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulationresult',
+            name='results',
+            field=models.JSONField(null=True),
+        ),
+        migrations.RunPython(fold_results, unfold_results),
+        migrations.RemoveField(
+            model_name='simulationresult',
+            name='current_data',
+        ),
+        migrations.RemoveField(
+            model_name='simulationresult',
+            name='emf_data',
+        ),
+        migrations.RemoveField(
+            model_name='simulationresult',
+            name='resistance_data',
+        ),
+        migrations.RemoveField(
+            model_name='simulationresult',
+            name='soc_data',
+        ),
+        migrations.RemoveField(
+            model_name='simulationresult',
+            name='temperature_data',
+        ),
+        migrations.RemoveField(
+            model_name='simulationresult',
+            name='terminal_voltage_data',
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-15 08:13
+
+from django.db import migrations, models
+
+
+def set_existing_status(apps, schema_editor):
+    """Existing rows are finished runs: done if they have results, otherwise interrupted"""
+    SimulationResult = apps.get_model('core1', 'SimulationResult')
+    SimulationResult.objects.filter(results__isnull=False).update(status='done')
+    SimulationResult.objects.filter(results__isnull=True).update(
+        status='failed', error='Simulation was interrupted before it finished',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core1', '0008_simulationresult_results'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulationresult',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='simulationresult',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(set_existing_status, migrations.RunPython.noop),
+    ]
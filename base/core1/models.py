@@ -34,6 +34,12 @@ class BatteryCell(models.Model):
     max_charge_current = models.FloatField(help_text="Maximum charge current in A")
     cycle_life = models.IntegerField(help_text="Expected cycle life")
     
+    class Meta:
+        constraints = [
+            # One spec per cell type/form factor; also indexes the lookup in the views
+            models.UniqueConstraint(fields=['cell_type', 'form_factor'], name='uq_cell_type_form_factor'),
+        ]
+    
     def __str__(self):
         return f"{self.get_cell_type_display()} - {self.get_form_factor_display()}"
     
@@ -53,8 +59,14 @@ class BatteryCell(models.Model):
 
 class SimulationResult(models.Model):
     """Model to store simulation results"""
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
     battery_cell = models.ForeignKey(BatteryCell, on_delete=models.CASCADE)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     
     # Input parameters
     load_resistance = models.FloatField(help_text="Load resistance in Ω")
@@ -62,13 +74,13 @@ class SimulationResult(models.Model):
     temperature = models.FloatField(help_text="Ambient temperature in °C")
     simulation_duration = models.IntegerField(help_text="Simulation duration in minutes")
     
-    # Results data (stored as JSON strings)
-    emf_data = models.JSONField(null=True)  # EMF over time
-    terminal_voltage_data = models.JSONField(null=True)  # Terminal voltage over time
-    current_data = models.JSONField(null=True)  # Current over time
-    resistance_data = models.JSONField(null=True)  # Internal resistance over time
-    soc_data = models.JSONField(null=True)  # State of charge over time
-    temperature_data = models.JSONField(null=True)  # Cell temperature over time
+    # Results data: one shared time axis plus each series over it
+    # {'time', 'emf', 'voltage', 'current', 'resistance', 'soc', 'temperature'}
+    results = models.JSONField(null=True)
+    
+    # Background run state; error holds the failure message when status is 'failed'
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending')
+    error = models.TextField(blank=True)
     
     def __str__(self):
         return f"Simulation for {self.battery_cell} at {self.created_at}"
@@ -1,10 +1,44 @@
 import numpy as np
+import base64
 import json
 import time
 from scipy.integrate import solve_ivp
 import threading
 import asyncio
 import math
+from scipy.linalg import lu_factor, lu_solve
+
+
+def _radial_operator(mesh_r):
+    """Matrix of the radial part of the cylindrical Laplacian (zero rows at the boundaries)"""
+    nr = len(mesh_r)
+    dr = float(mesh_r[1] - mesh_r[0])
+    L = np.zeros((nr, nr))
+    
+    for i in range(1, nr - 1):
+        r = float(mesh_r[i])
+        # d2T/dr2 + (1/r) dT/dr with central differences
+        L[i, i-1] = 1 / dr**2 - 1 / (2*dr*r)
+        L[i, i] = -2 / dr**2
+        L[i, i+1] = 1 / dr**2 + 1 / (2*dr*r)
+    
+    return L
+
+
+def _axial_operator(mesh_z):
+    """Matrix of the axial part of the Laplacian (zero rows at the boundaries)"""
+    nz = len(mesh_z)
+    dz = float(mesh_z[1] - mesh_z[0])
+    L = np.zeros((nz, nz))
+    
+    for j in range(1, nz - 1):
+        # d2T/dz2 with central differences
+        L[j, j-1] = 1 / dz**2
+        L[j, j] = -2 / dz**2
+        L[j, j+1] = 1 / dz**2
+    
+    return L
+
 
 class BatteryThermalSimulator:
     def __init__(self, params, callback=None):
@@ -20,6 +54,7 @@ class BatteryThermalSimulator:
         self.k = params.thermal_conductivity  # W/m·K
         self.cp = params.specific_heat_capacity  # J/kg·K
         self.rho = params.density  # kg/m³
+        self.h = 10.0  # Convective heat transfer coefficient (W/m²·K)
         
         # Initial conditions
         self.T_init = params.initial_temperature  # °C
@@ -33,19 +68,67 @@ class BatteryThermalSimulator:
         # Simulation settings
         self.dt = params.time_step  # seconds
         self.max_time = params.max_simulation_time  # seconds
+        self.wall_dt = getattr(params, 'wall_dt', 0.0)  # Wall-clock seconds per step (0 = as fast as possible)
+        self.max_fps = getattr(params, 'stream_fps', 10)  # Max callback frames per wall-clock second (0 = every step)
         
-        # Current profile
-        self.current_profile = json.loads(params.current_profile)
-        self.current_profile = {float(k): float(v) for k, v in self.current_profile.items()}
+        # Current profile, either already decoded (JSONField) or a JSON string
+        profile = params.current_profile
+        if isinstance(profile, str):
+            profile = json.loads(profile)
+        self.current_profile = {float(k): float(v) for k, v in profile.items()}
+        
+        # Sorted lookup arrays for interpolating the profile
+        self._t_arr = np.fromiter(sorted(self.current_profile), dtype=np.float64)
+        self._i_arr = np.array([self.current_profile[t] for t in self._t_arr])
         
         # Create spatial discretization
         self.nr = 10  # Number of radial nodes
         self.nz = 20  # Number of axial nodes
-        self.mesh_r = np.linspace(0, self.radius, self.nr)
-        self.mesh_z = np.linspace(0, self.height, self.nz)
+        self.mesh_r = np.linspace(0, self.radius, self.nr, dtype=np.float32)
+        self.mesh_z = np.linspace(0, self.height, self.nz, dtype=np.float32)
+        self.dr = float(self.mesh_r[1] - self.mesh_r[0])  # Radial step (m)
+        self.dz = float(self.mesh_z[1] - self.mesh_z[0])  # Axial step (m)
+        
+        # Loop-invariant coefficients of the heat equation
+        self._rho_cp = self.rho * self.cp  # J/m³·K
+        self._alpha = self.k / self._rho_cp  # Thermal diffusivity (m²/s)
+        self._heat_vol = math.pi * (self.radius/3)**2 * self.height  # Heated core volume (m³)
+        self._h_dr_k = self.dr * self.h / self.k
+        self._h_dz_k = self.dz * self.h / self.k
+        
+        # ADI (Peaceman-Rachford) operators: each step is a half step implicit in r, then a
+        # half step implicit in z. The implicit matrices are constant, so factor them once.
+        half_dt_alpha = 0.5 * self.dt * self._alpha
+        L_r = _radial_operator(self.mesh_r)
+        L_z = _axial_operator(self.mesh_z)
+        self._B_r = np.eye(self.nr) + half_dt_alpha * L_r
+        self._B_z = np.eye(self.nz) + half_dt_alpha * L_z
+        
+        A_r = np.eye(self.nr) - half_dt_alpha * L_r
+        # Center axis (r=0) - symmetry: T[0] = T[1]
+        A_r[0, 1] = -1.0
+        # Outer surface (r=R) - convective cooling: T[-1] = T[-2] - h*dr/k * (T[-2] - T_amb)
+        A_r[-1, -2] = -(1.0 - self._h_dr_k)
+        self._lu_r = lu_factor(A_r)
+        
+        A_z = np.eye(self.nz) - half_dt_alpha * L_z
+        # Top and bottom - convective cooling
+        A_z[0, 1] = -(1.0 - self._h_dz_k)
+        A_z[-1, -2] = -(1.0 - self._h_dz_k)
+        self._lu_z = lu_factor(A_z)
+        
+        # Heat distribution per watt generated (simplified as concentrated at the core)
+        self._q_unit = np.zeros((self.nr, self.nz), dtype=np.float32)
+        self._q_unit[0:self.nr//3, :] = 1.0 / self._heat_vol
+        
+        # Initialize temperature field (T_init everywhere); single precision is plenty
+        # for the cell's temperature range and halves the field's size
+        self.T = np.full((self.nr, self.nz), self.T_init, dtype=np.float32)
         
-        # Initialize temperature field (T_init everywhere)
-        self.T = np.ones((self.nr, self.nz)) * self.T_init
+        # ADI right-hand sides, solved in place. LAPACK wants column-major systems, so the
+        # radial one is Fortran-ordered and the axial one is C-ordered and solved transposed.
+        self._rhs_r = np.empty((self.nr, self.nz), order='F')
+        self._rhs_z = np.empty((self.nr, self.nz))
         
         # Initialize time and current
         self.current_time = 0.0
@@ -57,95 +140,63 @@ class BatteryThermalSimulator:
     
     def get_current(self, t):
         """Get current at time t by interpolating between points in the current profile"""
-        times = sorted(list(self.current_profile.keys()))
-        
-        if t <= times[0]:
-            return self.current_profile[times[0]]
-        
-        if t >= times[-1]:
-            return self.current_profile[times[-1]]
-        
-        # Find the two times that bracket t
-        for i in range(len(times) - 1):
-            if times[i] <= t < times[i + 1]:
-                t1, t2 = times[i], times[i + 1]
-                i1, i2 = self.current_profile[t1], self.current_profile[t2]
-                # Linear interpolation
-                return i1 + (i2 - i1) * (t - t1) / (t2 - t1)
+        # Linear interpolation, clamped to the first/last point outside the profile
+        return float(np.interp(t, self._t_arr, self._i_arr))
     
     def calculate_heat_generation(self, current):
         """Calculate heat generation based on current and internal resistance"""
-        # Joule heating: P = I²R
-        joule_heat = current**2 * self.resistance
-        
-        # Simplified heat distribution (concentrated at the core)
-        heat_density = np.zeros((self.nr, self.nz))
-        
-        # Distribute heat generation across the cell (simplified as concentrated in the center)
-        heat_density[0:self.nr//3, :] = joule_heat / (math.pi * (self.radius/3)**2 * self.height)
-        
-        return heat_density
+        # Joule heating: P = I²R, spread over the core via the precomputed unit distribution
+        return (current**2 * self.resistance) * self._q_unit
     
     def update_temperature(self):
-        """Update temperature field using finite difference method"""
-        # Previous temperature field
-        T_prev = self.T.copy()
-        
-        # Current heat generation
-        q = self.calculate_heat_generation(self.current)
-        
-        # Thermal diffusivity
-        alpha = self.k / (self.rho * self.cp)
-        
-        # New temperature field
-        T_new = np.zeros_like(self.T)
-        
-        # Finite difference method (simplified 2D radial-axial heat equation)
-        for i in range(1, self.nr - 1):
-            r = self.mesh_r[i]
-            dr = self.mesh_r[1] - self.mesh_r[0]
-            
-            for j in range(1, self.nz - 1):
-                dz = self.mesh_z[1] - self.mesh_z[0]
-                
-                # Radial component (including cylindrical term)
-                d2T_dr2 = (T_prev[i+1, j] - 2*T_prev[i, j] + T_prev[i-1, j]) / dr**2
-                dT_dr = (T_prev[i+1, j] - T_prev[i-1, j]) / (2*dr)
-                
-                # Axial component
-                d2T_dz2 = (T_prev[i, j+1] - 2*T_prev[i, j] + T_prev[i, j-1]) / dz**2
-                
-                # Heat equation in cylindrical coordinates
-                dT_dt = alpha * (d2T_dr2 + dT_dr/r + d2T_dz2) + q[i, j] / (self.rho * self.cp)
-                
-                # Update temperature
-                T_new[i, j] = T_prev[i, j] + dT_dt * self.dt
+        """Update temperature field using the ADI finite difference method"""
+        # Heat generation as a temperature source (K) over a half step. It is uniform over
+        # the core rows (see _q_unit), so it is added as a scalar to those rows only.
+        half_source = 0.5 * self.dt * self.current**2 * self.resistance / (self._rho_cp * self._heat_vol)
+        core = self.nr // 3
+        # Convective boundary rows/columns: T_b = (1 - h*d/k) * T_inner + h*d/k * T_amb
+        keep_r, amb_r = 1.0 - self._h_dr_k, self._h_dr_k * self.T_amb
+        keep_z, amb_z = 1.0 - self._h_dz_k, self._h_dz_k * self.T_amb
         
-        # Boundary conditions (simplified)
-        # Center axis (r=0) - symmetry
-        T_new[0, :] = T_new[1, :]
+        # Half step 1: implicit in r, explicit in z (solves every column at once)
+        rhs = np.matmul(self.T, self._B_z.T, out=self._rhs_r)
+        rhs[:core] += half_source
+        rhs[0, :] = 0.0
+        rhs[-1, :] = amb_r
+        T_half = lu_solve(self._lu_r, rhs, overwrite_b=True)
         
-        # Outer surface (r=R) - convective cooling
-        h = 10.0  # Convective heat transfer coefficient (W/m²·K)
-        T_new[-1, :] = T_new[-2, :] - dr * h / self.k * (T_new[-2, :] - self.T_amb)
+        # Axial boundaries aren't part of the radial solve
+        np.multiply(T_half[:, 1], keep_z, out=T_half[:, 0])
+        T_half[:, 0] += amb_z
+        np.multiply(T_half[:, -2], keep_z, out=T_half[:, -1])
+        T_half[:, -1] += amb_z
         
-        # Top and bottom - convective cooling
-        T_new[:, 0] = T_new[:, 1] - dz * h / self.k * (T_new[:, 1] - self.T_amb)
-        T_new[:, -1] = T_new[:, -2] - dz * h / self.k * (T_new[:, -2] - self.T_amb)
+        # Half step 2: implicit in z, explicit in r (solves every row at once)
+        rhs = np.matmul(self._B_r, T_half, out=self._rhs_z)
+        rhs[:core] += half_source
+        rhs[:, 0] = amb_z
+        rhs[:, -1] = amb_z
+        T_new = lu_solve(self._lu_z, rhs.T, overwrite_b=True).T
+        
+        # Radial boundaries aren't part of the axial solve
+        T_new[0, :] = T_new[1, :]
+        np.multiply(T_new[-2, :], keep_r, out=T_new[-1, :])
+        T_new[-1, :] += amb_r
         
-        self.T = T_new
+        # The solution sits in _rhs_z; self.T isn't read after the first matmul
+        np.copyto(self.T, T_new)
     
     def get_temperature_data(self):
         """Get temperature data for visualization"""
         # Temperature at different key points
-        center_temp = self.T[0, self.nz//2]
-        surface_temp = self.T[-1, self.nz//2]
-        top_temp = self.T[self.nr//2, -1]
-        bottom_temp = self.T[self.nr//2, 0]
+        center_temp = float(self.T[0, self.nz//2])
+        surface_temp = float(self.T[-1, self.nz//2])
+        top_temp = float(self.T[self.nr//2, -1])
+        bottom_temp = float(self.T[self.nr//2, 0])
         
         # Get the full temperature field for color mapping
-        # Convert to a more compact format for transmission
-        temp_field = self.T.tolist()
+        # Send it as base64-encoded float32 bytes (row-major) rather than nested lists
+        temp_field = base64.b64encode(self.T.tobytes()).decode('ascii')
         
         return {
             'time': self.current_time,
@@ -155,13 +206,19 @@ class BatteryThermalSimulator:
             'top_temp': top_temp,
             'bottom_temp': bottom_temp,
             'temp_field': temp_field,
-            'min_temp': np.min(self.T),
-            'max_temp': np.max(self.T)
+            'temp_field_shape': list(self.T.shape),
+            'temp_field_dtype': 'f4',
+            'min_temp': float(np.min(self.T)),
+            'max_temp': float(np.max(self.T))
         }
     
     def run_simulation(self):
         """Run the simulation"""
         self.running = True
+        min_interval = 1.0 / self.max_fps if self.max_fps > 0 else 0.0
+        last_emit = -math.inf
+        emitted_time = None
+        next_tick = time.monotonic() + self.wall_dt
         
         while self.running and self.current_time < self.max_time:
             if not self.paused:
@@ -174,13 +231,29 @@ class BatteryThermalSimulator:
                 # Update time
                 self.current_time += self.dt
                 
-                # Send data through callback
-                if self.callback:
+                # Send data through callback, capped at max_fps so a fast simulation
+                # doesn't flood slow consumers
+                now = time.monotonic()
+                if self.callback and now - last_emit >= min_interval:
                     data = self.get_temperature_data()
                     self.callback(data)
+                    last_emit = now
+                    emitted_time = self.current_time
                 
-                # Small delay to reduce CPU usage
-                time.sleep(0.1)  # Adjust based on desired real-time speed
+                # Pace against a monotonic deadline so step cost doesn't add to the delay
+                if self.wall_dt > 0:
+                    sleep_for = next_tick - time.monotonic()
+                    if sleep_for > 0:
+                        time.sleep(sleep_for)
+                    next_tick += self.wall_dt
+            else:
+                # Idle while paused instead of spinning
+                time.sleep(0.1)
+                next_tick = time.monotonic() + self.wall_dt
+        
+        # Always send the final state when the simulation runs to completion
+        if self.running and self.callback and emitted_time != self.current_time:
+            self.callback(self.get_temperature_data())
         
         self.running = False
     
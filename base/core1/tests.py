@@ -1,3 +1,304 @@
-from django.test import TestCase
+import json
+from types import SimpleNamespace
 
-# Create your tests here.
+import numpy as np
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from .models import BatteryCell, SimulationResult
+from .simulator import BatteryThermalSimulator
+from .views import _get_or_create_cell, run_simulation_task
+
+
+def make_cell():
+    return BatteryCell.objects.create(
+        cell_type='li_ion_phosphate',
+        form_factor='cylindrical',
+        length=65.0,
+        diameter=18.0,
+        nominal_voltage=3.2,
+        capacity=2500,
+        energy_density=120,
+        internal_resistance=25,
+        heat_resistance=10,
+        max_discharge_current=10,
+        max_charge_current=5,
+        cycle_life=2000,
+    )
+
+
+def make_params(**kwargs):
+    """Thermal simulator parameters for an 18650-sized cell"""
+    params = dict(
+        cell_radius=9.0,
+        cell_height=65.0,
+        thermal_conductivity=30.0,
+        specific_heat_capacity=900.0,
+        density=2500.0,
+        initial_temperature=25.0,
+        ambient_temperature=25.0,
+        nominal_capacity=2500.0,
+        nominal_voltage=3.2,
+        internal_resistance=0.05,
+        time_step=0.01,
+        max_simulation_time=3600.0,
+        current_profile=json.dumps({'0': 1.0, '10': 5.0, '20': 2.0}),
+    )
+    params.update(kwargs)
+    return SimpleNamespace(**params)
+
+
+def explicit_step(sim, T):
+    """One explicit FTCS step of the heat equation in float64 (reference solution)"""
+    alpha = sim.k / (sim.rho * sim.cp)
+    dr = float(sim.mesh_r[1] - sim.mesh_r[0])
+    dz = float(sim.mesh_z[1] - sim.mesh_z[0])
+    r = sim.mesh_r[1:-1].astype(np.float64).reshape(-1, 1)
+    q = sim.calculate_heat_generation(sim.current).astype(np.float64)
+    T_c = T[1:-1, 1:-1]
+
+    d2T_dr2 = (T[2:, 1:-1] - 2*T_c + T[:-2, 1:-1]) / dr**2
+    dT_dr = (T[2:, 1:-1] - T[:-2, 1:-1]) / (2*dr)
+    d2T_dz2 = (T[1:-1, 2:] - 2*T_c + T[1:-1, :-2]) / dz**2
+
+    T_new = np.zeros_like(T)
+    T_new[1:-1, 1:-1] = T_c + sim.dt * (alpha * (d2T_dr2 + dT_dr/r + d2T_dz2) + q[1:-1, 1:-1] / (sim.rho * sim.cp))
+    T_new[0, :] = T_new[1, :]
+    T_new[-1, :] = T_new[-2, :] - dr * sim.h / sim.k * (T_new[-2, :] - sim.T_amb)
+    T_new[:, 0] = T_new[:, 1] - dz * sim.h / sim.k * (T_new[:, 1] - sim.T_amb)
+    T_new[:, -1] = T_new[:, -2] - dz * sim.h / sim.k * (T_new[:, -2] - sim.T_amb)
+    return T_new
+
+
+def advance(sim, duration):
+    """Step the simulator forward by duration seconds"""
+    for _ in range(int(round(duration / sim.dt))):
+        sim.current = sim.get_current(sim.current_time)
+        sim.update_temperature()
+        sim.current_time += sim.dt
+
+
+def scan_current(profile, t):
+    """Sort-and-scan interpolation that get_current used to do"""
+    times = sorted(profile)
+    if t <= times[0]:
+        return profile[times[0]]
+    if t >= times[-1]:
+        return profile[times[-1]]
+    for i in range(len(times) - 1):
+        if times[i] <= t < times[i + 1]:
+            t1, t2 = times[i], times[i + 1]
+            return profile[t1] + (profile[t2] - profile[t1]) * (t - t1) / (t2 - t1)
+
+
+class CurrentProfileTests(SimpleTestCase):
+    """Tests for BatteryThermalSimulator.get_current"""
+
+    def setUp(self):
+        # Deliberately unsorted keys
+        self.profile = {'20': 2.0, '0': 1.0, '10': 5.0, '35': -1.5}
+        self.sim = BatteryThermalSimulator(make_params(current_profile=json.dumps(self.profile)))
+
+    def test_clamps_outside_profile(self):
+        self.assertEqual(self.sim.get_current(-5.0), 1.0)
+        self.assertEqual(self.sim.get_current(0.0), 1.0)
+        self.assertEqual(self.sim.get_current(35.0), -1.5)
+        self.assertEqual(self.sim.get_current(1000.0), -1.5)
+
+    def test_interpolates_like_linear_scan(self):
+        profile = {float(t): i for t, i in self.profile.items()}
+        for t in np.linspace(-10, 50, 241):
+            self.assertAlmostEqual(self.sim.get_current(t), scan_current(profile, t), places=12)
+
+    def test_accepts_decoded_profile(self):
+        sim = BatteryThermalSimulator(make_params(current_profile=self.profile))
+
+        self.assertEqual(sim.get_current(5.0), 3.0)
+
+
+class ThermalSolverTests(SimpleTestCase):
+    """Tests for the ADI solver in BatteryThermalSimulator"""
+
+    def test_matches_explicit_scheme_at_small_dt(self):
+        sim = BatteryThermalSimulator(make_params(time_step=0.01))
+        T_ref = sim.T.astype(np.float64)
+        for _ in range(3000):
+            sim.current = sim.get_current(sim.current_time)
+            T_ref = explicit_step(sim, T_ref)
+            sim.update_temperature()
+            sim.current_time += sim.dt
+
+        self.assertGreater(T_ref.max() - 25.0, 0.1)  # The cell has actually heated up
+        np.testing.assert_allclose(sim.T, T_ref, atol=2e-3)
+
+    def test_large_dt_is_stable(self):
+        # Far beyond the explicit scheme's limit of 0.5*min(dr, dz)**2/alpha (~0.04 s)
+        sim = BatteryThermalSimulator(make_params(time_step=1.0))
+        reference = BatteryThermalSimulator(make_params(time_step=0.1))
+
+        advance(sim, 300)
+        advance(reference, 300)
+
+        self.assertTrue(np.all(np.isfinite(sim.T)))
+        np.testing.assert_allclose(sim.T, reference.T, atol=5e-3)
+
+    def test_uniform_field_stays_uniform_without_current(self):
+        params = make_params(
+            time_step=1.0,
+            initial_temperature=30.0,
+            ambient_temperature=30.0,
+            current_profile=json.dumps({'0': 0.0}),
+        )
+        sim = BatteryThermalSimulator(params)
+
+        advance(sim, 100)
+
+        np.testing.assert_allclose(sim.T, 30.0, atol=1e-5)
+
+
+class DefaultCellTests(TestCase):
+    """Tests for resolving the BatteryCell used by a submitted simulation"""
+
+    def test_reuses_existing_cell(self):
+        cell = make_cell()
+
+        with self.assertNumQueries(1):
+            resolved = _get_or_create_cell('li_ion_phosphate', 'cylindrical')
+
+        self.assertEqual(resolved.pk, cell.pk)
+        self.assertEqual(resolved.get_deferred_fields(), {
+            'length', 'diameter', 'height', 'width', 'volume', 'energy_density',
+            'max_discharge_current', 'max_charge_current', 'cycle_life',
+        })
+        self.assertEqual(BatteryCell.objects.count(), 1)
+
+    def test_creates_default_cell(self):
+        cell = _get_or_create_cell('nimh', 'prismatic')
+
+        self.assertEqual((cell.cell_type, cell.form_factor), ('nimh', 'prismatic'))
+        self.assertEqual(cell.capacity, 2000)
+        self.assertEqual(_get_or_create_cell('nimh', 'prismatic').pk, cell.pk)
+        self.assertEqual(BatteryCell.objects.count(), 1)
+
+
+class SimulationDataTests(TestCase):
+    """Tests for the simulation results polling endpoint"""
+
+    def setUp(self):
+        self.cell = make_cell()
+
+    def make_simulation(self, **kwargs):
+        fields = dict(load_resistance=1.0, initial_soc=90, temperature=25, simulation_duration=10)
+        fields.update(kwargs)
+        return SimulationResult.objects.create(battery_cell=self.cell, **fields)
+
+    def get_data(self, simulation_id):
+        return self.client.get(reverse('get_simulation_data', args=[simulation_id]))
+
+    def test_pending(self):
+        simulation = self.make_simulation()
+
+        response = self.get_data(simulation.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'ready': False, 'status': 'pending'})
+
+    def test_ready(self):
+        simulation = self.make_simulation()
+        run_simulation_task(simulation)
+
+        data = self.get_data(simulation.id).json()
+
+        self.assertTrue(data['ready'])
+        self.assertEqual(data['status'], 'done')
+        for key in ('emf', 'voltage', 'current', 'resistance', 'soc', 'temperature'):
+            self.assertEqual(len(data[key]), len(data['time']))
+        self.assertEqual(len(data['time']), 10 * 6)
+
+    def test_failed(self):
+        simulation = self.make_simulation(simulation_duration=-5)
+        with self.assertLogs('core1.views', level='ERROR'):
+            run_simulation_task(simulation)
+
+        simulation.refresh_from_db()
+        data = self.get_data(simulation.id).json()
+
+        self.assertEqual(simulation.status, 'failed')
+        self.assertIsNone(simulation.results)
+        self.assertFalse(data['ready'])
+        self.assertEqual(data['status'], 'failed')
+        self.assertTrue(data['error'])
+
+    def test_not_found(self):
+        response = self.get_data(9999)
+
+        self.assertEqual(response.status_code, 404)
+
+
+class ResultsMigrationTests(TransactionTestCase):
+    """Tests for folding the per-series result fields into results (migration 0008)"""
+
+    before = [('core1', '0007_alter_simulationresult_created_at_and_more')]
+    after = [('core1', '0008_simulationresult_results')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        self.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_fold_and_unfold(self):
+        apps = self.migrate(self.before)
+        BatteryCell = apps.get_model('core1', 'BatteryCell')
+        SimulationResult = apps.get_model('core1', 'SimulationResult')
+
+        cell = BatteryCell.objects.create(
+            cell_type='nimh', form_factor='cylindrical', length=60, nominal_voltage=1.2, capacity=2000,
+            energy_density=80, internal_resistance=30, heat_resistance=12, max_discharge_current=8,
+            max_charge_current=4, cycle_life=1500,
+        )
+        time = [0.0, 1.0, 2.0]
+        inputs = dict(battery_cell=cell, load_resistance=1.0, initial_soc=90, temperature=25, simulation_duration=1)
+        finished = SimulationResult.objects.create(
+            emf_data={'time': time, 'emf': [3.3, 3.2, 3.1]},
+            terminal_voltage_data={'time': time, 'voltage': [3.2, 3.1, 3.0]},
+            current_data={'time': time, 'current': [0.5, 0.4, 0.3]},
+            resistance_data={'time': time, 'resistance': [0.03, 0.04, 0.05], 'soc': [0.9, 0.5, 0.25]},
+            soc_data={'time': time, 'soc': [90.0, 50.0, 25.0]},
+            temperature_data={'time': time, 'temperature': [25.0, 25.5, 26.0]},
+            **inputs,
+        )
+        empty = SimulationResult.objects.create(**inputs)
+
+        apps = self.migrate(self.after)
+        SimulationResult = apps.get_model('core1', 'SimulationResult')
+
+        self.assertEqual(SimulationResult.objects.get(pk=finished.pk).results, {
+            'time': time,
+            'emf': [3.3, 3.2, 3.1],
+            'voltage': [3.2, 3.1, 3.0],
+            'current': [0.5, 0.4, 0.3],
+            'resistance': [0.03, 0.04, 0.05],
+            'soc': [90.0, 50.0, 25.0],
+            'temperature': [25.0, 25.5, 26.0],
+        })
+        self.assertIsNone(SimulationResult.objects.get(pk=empty.pk).results)
+
+        apps = self.migrate(self.before)
+        SimulationResult = apps.get_model('core1', 'SimulationResult')
+
+        restored = SimulationResult.objects.get(pk=finished.pk)
+        self.assertEqual(restored.emf_data, {'time': time, 'emf': [3.3, 3.2, 3.1]})
+        self.assertEqual(restored.terminal_voltage_data, {'time': time, 'voltage': [3.2, 3.1, 3.0]})
+        self.assertEqual(restored.current_data, {'time': time, 'current': [0.5, 0.4, 0.3]})
+        self.assertEqual(restored.resistance_data,
+                         {'time': time, 'resistance': [0.03, 0.04, 0.05], 'soc': [0.9, 0.5, 0.25]})
+        self.assertEqual(restored.soc_data, {'time': time, 'soc': [90.0, 50.0, 25.0]})
+        self.assertEqual(restored.temperature_data, {'time': time, 'temperature': [25.0, 25.5, 26.0]})
+        self.assertIsNone(SimulationResult.objects.get(pk=empty.pk).temperature_data)
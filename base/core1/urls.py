@@ -5,4 +5,5 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('simulation/<int:simulation_id>/', views.simulation_results, name='simulation_results'),
     path('api/cell-specs/', views.get_cell_specs, name='get_cell_specs'),
+    path('api/simulation/<int:simulation_id>/', views.get_simulation_data, name='get_simulation_data'),
 ]
\ No newline at end of file
@@ -1,10 +1,57 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.http import JsonResponse
+from django.db import connection
 from .models import BatteryCell, SimulationResult
 from .forms import BatteryCellSelectionForm, SimulationParametersForm 
-import json
+import logging
 import math
+import threading
 import numpy as np
+from numba import njit
+
+logger = logging.getLogger(__name__)
+
+def _get_or_create_cell(cell_type, form_factor):
+    """Get the BatteryCell for a cell type/form factor, creating a default cell if missing"""
+    if cell_type == 'li_ion_phosphate' and form_factor == 'cylindrical':
+        defaults = {
+            'length': 65.0,
+            'diameter': 18.0,
+            'nominal_voltage': 3.2,
+            'capacity': 2500,
+            'energy_density': 120,
+            'internal_resistance': 25,
+            'heat_resistance': 10,
+            'max_discharge_current': 10,
+            'max_charge_current': 5,
+            'cycle_life': 2000
+        }
+    else:
+        # Generic values for other cell types
+        defaults = {
+            'length': 60.0,
+            'diameter': 18.0,
+            'height': 10.0,
+            'width': 30.0,
+            'nominal_voltage': 3.7,
+            'capacity': 2000,
+            'energy_density': 100,
+            'internal_resistance': 30,
+            'heat_resistance': 12,
+            'max_discharge_current': 8,
+            'max_charge_current': 4,
+            'cycle_life': 1500
+        }
+    # Only load the fields run_battery_simulation reads
+    cells = BatteryCell.objects.only(
+        'cell_type', 'form_factor', 'nominal_voltage', 'capacity',
+        'internal_resistance', 'heat_resistance',
+    )
+    # get_or_create re-fetches if a concurrent request inserts the same pair first
+    cell, _ = cells.get_or_create(
+        cell_type=cell_type, form_factor=form_factor, defaults=defaults
+    )
+    return cell
 
 def index(request):
     """Main view for the battery simulation app"""
@@ -19,53 +66,17 @@ def index(request):
             cell_type = cell_form.cleaned_data['cell_type']
             form_factor = cell_form.cleaned_data['form_factor']
             # Get or create battery cell
-            try:
-                cell = BatteryCell.objects.get(cell_type=cell_type, form_factor=form_factor)
-            except BatteryCell.DoesNotExist:
-                # Create default cell if not exists
-                if cell_type == 'li_ion_phosphate' and form_factor == 'cylindrical':
-                    cell = BatteryCell(
-                        cell_type=cell_type,
-                        form_factor=form_factor,
-                        length=65.0,
-                        diameter=18.0,
-                        nominal_voltage=3.2,
-                        capacity=2500,
-                        energy_density=120,
-                        internal_resistance=25,
-                        heat_resistance=10,
-                        max_discharge_current=10,
-                        max_charge_current=5,
-                        cycle_life=2000
-                    )
-                    cell.save()
-                else:
-                    # Generic values for other cell types
-                    cell = BatteryCell(
-                        cell_type=cell_type,
-                        form_factor=form_factor,
-                        length=60.0,
-                        diameter=18.0,
-                        height=10.0,
-                        width=30.0,
-                        nominal_voltage=3.7,
-                        capacity=2000,
-                        energy_density=100,
-                        internal_resistance=30,
-                        heat_resistance=12,
-                        max_discharge_current=8,
-                        max_charge_current=4,
-                        cycle_life=1500
-                    )
-                    cell.save()
+            cell = _get_or_create_cell(cell_type, form_factor)
             
             # Create simulation
             simulation = simulation_form.save(commit=False)
             simulation.battery_cell = cell
-
-            # Run simulation
-            run_battery_simulation(simulation)
             simulation.save()
+
+            # Run simulation in a separate thread; the results page polls until it is done
+            sim_thread = threading.Thread(target=run_simulation_task, args=(simulation,))
+            sim_thread.daemon = True
+            sim_thread.start()
             
             return redirect('simulation_results', simulation_id=simulation.id)
     
@@ -76,13 +87,86 @@ def index(request):
 
 def simulation_results(request, simulation_id):
     """View for displaying simulation results"""
-    simulation = SimulationResult.objects.get(id=simulation_id)
+    simulation = get_object_or_404(
+        SimulationResult.objects.select_related('battery_cell'), id=simulation_id
+    )
     
     return render(request, 'battery_app/simulation_results.html', {
         'simulation': simulation,
         'cell': simulation.battery_cell,
     })
 
+def get_simulation_data(request, simulation_id):
+    """API endpoint to poll for simulation results"""
+    try:
+        simulation = SimulationResult.objects.get(id=simulation_id)
+    except SimulationResult.DoesNotExist:
+        return JsonResponse({'error': 'Simulation not found'}, status=404)
+    
+    if simulation.status == 'failed':
+        return JsonResponse({'ready': False, 'status': simulation.status, 'error': simulation.error})
+    
+    if simulation.status != 'done':
+        return JsonResponse({'ready': False, 'status': simulation.status})
+    
+    return JsonResponse({'ready': True, 'status': simulation.status, **simulation.results})
+
+def run_simulation_task(simulation):
+    """Run the simulation and save its results (executed in a background thread)"""
+    try:
+        run_battery_simulation(simulation)
+        simulation.status = 'done'
+        simulation.save(update_fields=['results', 'status'])
+    except Exception as e:
+        # Record the failure so the results page can stop polling and report it
+        logger.exception("Simulation %s failed", simulation.pk)
+        SimulationResult.objects.filter(pk=simulation.pk).update(status='failed', error=str(e))
+    finally:
+        # Threads get their own DB connection; don't leak it
+        connection.close()
+
+@njit(cache=True)
+def _battery_kernel(time_hours, initial_soc, c_rate, nominal_voltage, base_r,
+                    discharge_current, load_r, heat_r, ambient_temp):
+    """Compute all battery time series in a single pass over the time axis"""
+    n = time_hours.shape[0]
+    soc = np.empty(n)
+    internal_resistance = np.empty(n)
+    emf = np.empty(n)
+    terminal_voltage = np.empty(n)
+    current = np.empty(n)
+    temperature = np.empty(n)
+    
+    for k in range(n):
+        # SOC decreases linearly for simplicity, but doesn't go below 0
+        soc_k = max(initial_soc - (time_hours[k] * c_rate / 5.0), 0.0)
+        
+        # Internal resistance varies with SOC (simplified model)
+        # Increases as SOC decreases
+        r_k = base_r * (1 + 0.5 * (1 - soc_k))
+        # EMF varies with SOC (simplified model for LiFePO4)
+        # LiFePO4 has a relatively flat voltage curve
+        emf_k = nominal_voltage * (0.9 + 0.2 * soc_k)
+        
+        # Terminal voltage with load
+        vt_k = emf_k - (discharge_current * r_k)
+        
+        # Current calculation
+        i_k = vt_k / (load_r + r_k)
+        
+        # Cell temperature calculation (simplified)
+        # Heat generated = I^2 * R
+        heat_generated = i_k**2 * r_k
+        
+        soc[k] = soc_k
+        internal_resistance[k] = r_k
+        emf[k] = emf_k
+        terminal_voltage[k] = vt_k
+        current[k] = i_k
+        temperature[k] = ambient_temp + heat_generated / heat_r
+    
+    return soc, internal_resistance, emf, terminal_voltage, current, temperature
+
 def run_battery_simulation(simulation):
     """Run the battery simulation and populate the simulation object with results"""
     cell = simulation.battery_cell
@@ -106,60 +190,21 @@ def run_battery_simulation(simulation):
     c_rate = 0.2
     discharge_current = capacity_ah * c_rate
     
-    # SOC decreases linearly for simplicity
-    soc = initial_soc - (time_hours * c_rate / 5.0)
-    soc = np.maximum(soc, 0.0)  # Ensure SOC doesn't go below 0
-    
-    # Internal resistance varies with SOC (simplified model)
-    # Increases as SOC decreases
-    internal_resistance = base_internal_resistance * (1 + 0.5 * (1 - soc))
-    # EMF varies with SOC (simplified model for LiFePO4)
-    # LiFePO4 has a relatively flat voltage curve
-    emf = nominal_voltage * (0.9 + 0.2 * soc)
-    
-    # Terminal voltage with load
-    terminal_voltage = emf - (discharge_current * internal_resistance)
+    soc, internal_resistance, emf, terminal_voltage, current, temperature = _battery_kernel(
+        time_hours, initial_soc, c_rate, nominal_voltage, base_internal_resistance,
+        discharge_current, load_resistance, cell.heat_resistance, ambient_temp,
+    )
     
-    # Current calculation
-    current = terminal_voltage / (load_resistance + internal_resistance)
-    
-    # Cell temperature calculation (simplified)
-    # Heat generated = I^2 * R
-    heat_generated = current**2 * internal_resistance
-    temp_rise = heat_generated / cell.heat_resistance
-    temperature = ambient_temp + temp_rise
-    
-    # Prepare data for JSON storage
-    simulation.emf_data = json.dumps({
-        'time': time.tolist(),
-        'emf': emf.tolist()
-    })
-    
-    simulation.terminal_voltage_data = json.dumps({
-        'time': time.tolist(),
-        'voltage': terminal_voltage.tolist()
-    })
-    
-    simulation.current_data = json.dumps({
-        'time': time.tolist(),
-        'current': current.tolist()
-    })
-    
-    simulation.resistance_data = json.dumps({
+    # Prepare data for JSON storage (JSONField serializes, so assign a plain dict)
+    simulation.results = {
         'time': time.tolist(),
+        'emf': emf.tolist(),
+        'voltage': terminal_voltage.tolist(),
+        'current': current.tolist(),
         'resistance': internal_resistance.tolist(),
-        'soc': soc.tolist()
-    })
-    
-    simulation.soc_data = json.dumps({
-        'time': time.tolist(),
-        'soc': (soc * 100).tolist()  # Convert back to percentage
-    })
-    
-    simulation.temperature_data = json.dumps({
-        'time': time.tolist(),
-        'temperature': temperature.tolist()
-    })
+        'soc': (soc * 100).tolist(),  # Convert back to percentage
+        'temperature': temperature.tolist(),
+    }
 def get_cell_specs(request):
     """API endpoint to get cell specifications"""
     cell_type = request.GET.get('cell_type')